@@ -19,16 +19,34 @@ import os
 import uuid
 import argparse
 import subprocess
-import re
 import json
 import yaml
 import shutil
-from shlex import quote
+import time
+import signal
+import stat
+import socket
+import http.client
+from urllib.parse import urlencode, quote as urlquote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 
 # script name (to which symlinks should point to)
 SCRIPT_FILE_NAME = "_ks.py"
 # where to store the current namespace
 CUR_NS_PATH = os.environ.get("KUBESHORT_CUR_NS_PATH", "/tmp/.k8s-cur-ns")
+# where to cache the list of namespaces (per kubeconfig context)
+NS_CACHE_PATH = os.environ.get("KUBESHORT_NS_CACHE_PATH", "/tmp/.k8s-ns-cache-%d.json" % os.getuid())
+# number of seconds after which the cached namespace list gets refreshed in the background
+NS_CACHE_TTL = int(os.environ.get("KUBESHORT_NS_CACHE_TTL", "600"))
+# fetch JSON through a shared, background "kubectl proxy" instead of running kubectl each time
+USE_PROXY = os.environ.get("KUBESHORT_USE_PROXY", "1") not in ["0", "false", "off"]
+# where to store the state of the background kubectl proxy (its unix socket gets the .sock suffix)
+PROXY_STATE_PATH = os.environ.get("KUBESHORT_PROXY_STATE_PATH", "/tmp/.k8s-proxy-%d" % os.getuid())
+# unix socket of the background kubectl proxy
+PROXY_SOCKET_PATH = PROXY_STATE_PATH + ".sock"
+# number of seconds after which an unused background kubectl proxy stops
+PROXY_IDLE_TIMEOUT = int(os.environ.get("KUBESHORT_PROXY_IDLE_TIMEOUT", "600"))
 # prefix for all helpers (and thus also for the creaed symlinks)
 HELPER_PREFIX = "k."
 # allow even shorter object names (e.g. "cj" for "cronjob") which are not officialy accepted by kubectl get <shortname>
@@ -38,7 +56,7 @@ DEFAULT_TAIL = os.environ.get("KUBESHORT_DEFAULT_TAIL", "20")
 # default user for SSH login
 DEFAULT_USER = os.environ.get("KUBESHORT_DEFAULT_USER", "ubuntu")
 # known k8s resources (to strip "resource/"NAME prefix)
-KNOWN_K8S_RESOURCES = ["bindings", "componentstatuses", "configmaps", "endpoints", "events", "limitranges", "namespaces", "nodes", "persistentvolumeclaims",
+KNOWN_K8S_RESOURCES = frozenset(("bindings", "componentstatuses", "configmaps", "endpoints", "events", "limitranges", "namespaces", "nodes", "persistentvolumeclaims",
                        "persistentvolumes", "pods", "podtemplates", "replicationcontrollers", "resourcequotas", "secrets", "serviceaccounts", "services",
                        "mutatingwebhookconfigurations", "validatingwebhookconfigurations", "customresourcedefinitions", "apiservices", "controllerrevisions",
                        "daemonsets", "deployments", "deployment.apps", "replicasets", "statefulsets", "meshpolicies", "policies", "tokenreviews", "localsubjectaccessreviews",
@@ -55,7 +73,7 @@ KNOWN_K8S_RESOURCES = ["bindings", "componentstatuses", "configmaps", "endpoints
                        "cs", "cm", "ep", "ev", "limits", "ns", "no", "pvc", "pv", "po", "rc", "quota", "sa", "svc", "crd", "crds", "apps", "ds", "deploy", "rs", "sts",
                        "hpa", "vpacheckpoint", "vpa", "cj", "batch", "csr", "cert", "certs", "ds", "deploy", "ing", "netpol", "psp", "rs", "capreq", "mcrt", "dr",
                        "gw", "se",  "vs", "ing", "netpol", "updinf", "pdb", "psp", "pc", "sc"
-                       ]
+                       ))
 FILTER_ATTRIBUTES = ["annotations.kubectl.kubernetes.io/restartedAt", "metadata.generateName", "metadata.ownerReferences.uid",
                     "metadata.uid", "metadata.resourceVersion", "metadata.selfLink", "metadata.managedFields", "metadata.creationTimestamp",
                     "metadata.annotations.kubectl.kubernetes.io/last-applied-configuration",
@@ -63,6 +81,11 @@ FILTER_ATTRIBUTES = ["annotations.kubectl.kubernetes.io/restartedAt", "metadata.
                     "spec.containers.restartPolicy", "spec.containers.terminationGracePeriodSeconds",
                     "status.conditions", "status.containerStatuses.lastState"]
 
+# ssh options for connecting to nodes
+SSH_OPTIONS = ["-o", "UserKnownHostsFile=/dev/null", "-o", "StrictHostKeyChecking=off", "-o", "LogLevel=error"]
+# max number of nodes to run ssh commands on at once
+MAX_SSH_PARALLEL = 32
+
 # find and run the best shell
 SHELL_FINDER="sh -c 'if type bash > /dev/null; then exec bash; else exec sh; fi'"
 
@@ -75,23 +98,6 @@ def fail(msg):
 def rand_ident():
     return str(uuid.uuid4().fields[-1])[:5]
 
-# Returns length of the longest value of attrname key-name in the subkeys of obj.
-# Example:
-# obj:
-#  - subkey1:
-#    attrname: "some str"
-#  - subkey2:
-#    attrname: "other str"
-def max_attr_len(obj, subkeys, attrname):
-    nlen = 0
-    for sub in subkeys:
-        if sub in obj:
-            for sobj in obj[sub]:
-                l = len(sobj[attrname])
-                if l > nlen:
-                    nlen = l
-    return nlen
-
 # exec kubectl, replacing the current process
 def exec_kubectl(args, pager=False, pre_cmd=None):
     pager_tool = None
@@ -105,64 +111,425 @@ def exec_kubectl(args, pager=False, pre_cmd=None):
             pager_tool = shutil.which("more")
 
     if pager_tool:
-        args = pre_cmd + ["kubectl"] + args
-        os.execvp("sh", ["sh", "-c", ' '.join(quote(arg)
-                                              for arg in args)+"|"+pager_tool])
+        # kubectl in the child writing to the pipe, the pager replacing this process
+        # (so that the shell waits until the pager quits)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            cmd = pre_cmd + ["kubectl"] + args
+            try:
+                os.close(read_fd)
+                os.dup2(write_fd, sys.stdout.fileno())
+                os.close(write_fd)
+                os.execvp(cmd[0], cmd)
+            except OSError as e:
+                print("Unable to run %s: %s" % (cmd[0], e), file=sys.stderr)
+                sys.stderr.flush()
+            os._exit(127)
+
+        os.close(write_fd)
+        os.dup2(read_fd, sys.stdin.fileno())
+        os.close(read_fd)
+        os.execvp(pager_tool, [pager_tool])
     else:
         pre_cmd.append("kubectl") 
         os.execvp(pre_cmd[0], pre_cmd + args)
 
 # run kubectl and return stdout
 def run_kubectl(args):
-    res = subprocess.run(['kubectl'] + args, stdout=subprocess.PIPE)
-    return str(res.stdout, encoding="utf-8")
-
-# run kubectl and return json-decoded array of items
-def kubectl_items(args):
-    j = json.loads(run_kubectl(args))
-
-    items = []
-    if "items" in j:
-        items = j["items"]
-    else:
-        items = [j]
-
-    return items
-
+    res = subprocess.run(['kubectl'] + args, stdout=subprocess.PIPE, encoding="utf-8")
+    return res.stdout
+
+# run kubectl printing just the given tab-separated columns of each object of the kind
+# (using go-template, which handles both a single object and a list) and return the rows
+def kubectl_rows(args, kind, columns_template):
+    tmpl = '{{define "item"}}' + columns_template + '{{"\\n"}}{{end}}'
+    tmpl += '{{if eq .kind "%s"}}{{template "item" .}}{{else}}{{range .items}}{{template "item" .}}{{end}}{{end}}' % kind
+
+    return [l.split("\t") for l in run_kubectl(args + ["-o", "go-template=" + tmpl]).splitlines()]
+
+# parse "key=value key2=value2 " column printed by kubectl_rows into a list of dicts
+def kubectl_pairs_column(col, key_name, value_name):
+    out = []
+    for pair in col.split():
+        k, _, v = pair.partition("=")
+        out.append({key_name: k, value_name: v})
+    return out
 
-cur_ns = ""
+cur_ns = None
 
-# get currently-selected namespace
+# get currently-selected namespace (read only once)
 def get_ns():
     global cur_ns
 
-    if len(cur_ns) > 0:
+    if cur_ns != None:
         return cur_ns
 
-    if os.path.exists(CUR_NS_PATH):
-        with open(CUR_NS_PATH, "rb") as f:
-            cur_ns = str(f.read(), encoding="utf-8")
-            f.close()
-            return cur_ns
-    else:
-        return "default"
+    try:
+        fd = os.open(CUR_NS_PATH, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        cur_ns = "default"
+        return cur_ns
+
+    try:
+        cur_ns = os.read(fd, 4096).decode("utf-8")
+    finally:
+        os.close(fd)
+
+    if len(cur_ns) == 0:
+        cur_ns = "default"
+
+    return cur_ns
 
 # set the current namespace
 def set_ns(ns: str):
     global cur_ns
 
-    with open(CUR_NS_PATH, "wb") as f:
-        f.write(ns.encode("utf-8"))
+    with open(CUR_NS_PATH, "w", encoding="utf-8") as f:
+        f.write(ns)
         cur_ns = ns
         f.close()
 
     print("Switched to namespace \"%s\"." % ns, file=sys.stderr)
 
 
-# list of known helper names (the name after "k.") which will be created
-# as symbolic links and assigned argument-mediating functions
+cur_ctx = ""
+
+# list of kubeconfig file paths in effect
+def kubeconfig_paths():
+    return os.environ.get("KUBECONFIG", os.path.expanduser("~/.kube/config")).split(os.pathsep)
+
+# get current kubeconfig context
+def get_ctx():
+    global cur_ctx
+
+    if len(cur_ctx) == 0:
+        # read it from the kubeconfig directly (the first file setting it wins, like in kubectl)
+        for path in kubeconfig_paths():
+            try:
+                with open(path) as f:
+                    cfg = yaml.safe_load(f)
+            except (OSError, yaml.YAMLError):
+                continue
+
+            if isinstance(cfg, dict) and cfg.get("current-context"):
+                cur_ctx = cfg["current-context"]
+                break
+        else:
+            cur_ctx = run_kubectl(["config", "current-context"]).strip()
+
+    return cur_ctx
+
+# fetch namespace names from the cluster and store them in the cache
+# (returns None and keeps the previous cache if kubectl fails or the cache can't be written)
+def refresh_ns_cache(ctx, quiet=False):
+    res = subprocess.run(["kubectl", "get", "namespaces", "-o", "jsonpath={.items[*].metadata.name}"],
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL if quiet else None, encoding="utf-8")
+    if res.returncode != 0:
+        return None
+
+    names = res.stdout.split()
+
+    tmp_path = NS_CACHE_PATH + "." + str(os.getpid())
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"ctx": ctx, "ts": time.time(), "names": names}, f)
+        os.replace(tmp_path, NS_CACHE_PATH)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+    return names
+
+# refresh the namespace cache in a forked background process
+def refresh_ns_cache_background(ctx):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if os.fork() == 0:
+        try:
+            refresh_ns_cache(ctx, quiet=True)
+        finally:
+            os._exit(0)
+
+# list namespace names of the current context, served from the cache;
+# a stale cache is returned as is and refreshed by a background process.
+# Without a cache for the context, the names are fetched right away or, with block=False,
+# None is returned and the cache is filled in the background.
+def list_namespaces_cached(ttl=NS_CACHE_TTL, block=True):
+    ctx = get_ctx()
+
+    try:
+        with open(NS_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = None
+
+    if cache is None or cache.get("ctx") != ctx:
+        if not block:
+            refresh_ns_cache_background(ctx)
+            return None
+        return refresh_ns_cache(ctx)
+
+    if time.time() - cache.get("ts", 0) >= ttl:
+        refresh_ns_cache_background(ctx)
+
+    return cache.get("names", [])
+
+# HTTP connection over a unix socket
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+# identification of the cluster and credentials a kubectl proxy serves:
+# the context name and the kubeconfig files with their modification times
+def proxy_key():
+    files = []
+    for path in kubeconfig_paths():
+        try:
+            files.append([path, os.stat(path).st_mtime_ns])
+        except OSError:
+            files.append([path, None])
+
+    return {"ctx": get_ctx(), "kubeconfig": files}
+
+# whether the path is a file of the given type (e.g. stat.S_ISSOCK) owned by the current user
+def owned_by_me(path, is_type=stat.S_ISREG):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+
+    return st.st_uid == os.getuid() and is_type(st.st_mode)
+
+# start time of the process (in clock ticks since boot) if it's running under the current user
+def proc_start_time(pid):
+    try:
+        if os.stat("/proc/%d" % pid).st_uid != os.getuid():
+            return None
+        with open("/proc/%d/stat" % pid, "rb") as f:
+            stat_fields = f.read().rsplit(b")", 1)[1].split()
+    except (OSError, TypeError, IndexError):
+        return None
+
+    return int(stat_fields[19])
+
+# whether the proxy recorded in the state is still running: the same pid started at the same time
+# (the command line is not checked as kubectl may be a wrapper exec'ing the real binary)
+def is_our_proxy(state):
+    start = proc_start_time(state["pid"])
+    return start != None and start == state.get("start")
+
+# whether the proxy recorded in the state can't be ruled out to be running
+# (e.g. a state file without the start time and a process with that pid)
+def proxy_may_be_running(state):
+    if is_our_proxy(state):
+        return True
+    if isinstance(state.get("start"), int):
+        return False
+    return os.path.exists("/proc/%d" % state["pid"])
+
+# read the proxy state file if it's ours
+def read_proxy_state():
+    if not owned_by_me(PROXY_STATE_PATH):
+        return None
+
+    try:
+        with open(PROXY_STATE_PATH) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(state, dict) or not isinstance(state.get("pid"), int):
+        return None
+
+    return state
+
+# stop the kubectl proxy recorded in the state file (if it's really our proxy) and remove its files
+def stop_proxy():
+    state = read_proxy_state()
+    if state != None and is_our_proxy(state):
+        # the whole process group, in case kubectl is a wrapper running the real binary as a child
+        os.killpg(state["pid"], signal.SIGTERM)
+
+    for path in [PROXY_STATE_PATH, PROXY_SOCKET_PATH]:
+        if owned_by_me(path, stat.S_ISREG) or owned_by_me(path, stat.S_ISSOCK):
+            os.remove(path)
+
+# stop the kubectl proxy of the given state once the state file no longer refers to it
+# or it hasn't been used (the state file touched) for PROXY_IDLE_TIMEOUT seconds
+def proxy_watchdog(proxy_state):
+    while True:
+        time.sleep(min(30, max(1, PROXY_IDLE_TIMEOUT)))
+
+        if not is_our_proxy(proxy_state):
+            return
+
+        state = read_proxy_state()
+        if state == None or state["pid"] != proxy_state["pid"]:
+            os.killpg(proxy_state["pid"], signal.SIGTERM)
+            return
+
+        try:
+            idle = time.time() - os.stat(PROXY_STATE_PATH).st_mtime
+        except OSError:
+            idle = PROXY_IDLE_TIMEOUT
+
+        if idle >= PROXY_IDLE_TIMEOUT:
+            stop_proxy()
+            return
+
+# start a background kubectl proxy listening on a unix socket accessible only by the current user,
+# along with a watchdog process stopping it when idle
+def start_proxy(key):
+    # previous proxy files (files of other users can't be removed from /tmp and kubectl will fail)
+    stop_proxy()
+
+    # in a new session, so the proxy is the leader of its own process group
+    proc = subprocess.Popen(["kubectl", "proxy", "--unix-socket", PROXY_SOCKET_PATH], stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True, umask=0o077)
+    state = {"pid": proc.pid, "start": proc_start_time(proc.pid), "key": key}
+
+    # wait for the proxy to start listening
+    for _ in range(50):
+        if state["start"] == None or proc.poll() != None:
+            break
+        if owned_by_me(PROXY_SOCKET_PATH, stat.S_ISSOCK):
+            # create the state file exclusively (never following a planted symlink) and move it in place
+            tmp_path = PROXY_STATE_PATH + "." + str(os.getpid())
+            try:
+                with open(tmp_path, "x") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, PROXY_STATE_PATH)
+            except OSError:
+                break
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                try:
+                    os.setsid()
+                    devnull = os.open(os.devnull, os.O_RDWR)
+                    for fd in range(3):
+                        os.dup2(devnull, fd)
+                    proxy_watchdog(state)
+                finally:
+                    os._exit(0)
+
+            return PROXY_SOCKET_PATH
+        time.sleep(0.1)
+
+    # not started properly
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    proc.wait()
+    return None
+
+# return the unix socket path of a running kubectl proxy for the current kubeconfig, starting it if needed
+def proxy_socket():
+    # the proxy process can't be verified without /proc
+    if not os.path.isdir("/proc/self"):
+        return None
+
+    key = proxy_key()
+    state = read_proxy_state()
+
+    if state != None:
+        if is_our_proxy(state) and state.get("key") == key and owned_by_me(PROXY_SOCKET_PATH, stat.S_ISSOCK):
+            # mark as used for the watchdog
+            os.utime(PROXY_STATE_PATH)
+            return PROXY_SOCKET_PATH
+
+        # never start a second proxy next to one which may still be running but can't be stopped
+        if proxy_may_be_running(state) and not is_our_proxy(state):
+            return None
+
+    return start_proxy(key)
+
+api_conn = None
+
+# GET an API path through the kubectl proxy and return the decoded JSON, or None when it's not possible;
+# with metadata_only, lists contain just the object metadata
+def api_get(path, params=None, metadata_only=False):
+    global api_conn
+
+    if not USE_PROXY:
+        return None
+
+    try:
+        if api_conn == None:
+            sock_path = proxy_socket()
+            if sock_path == None:
+                return None
+            api_conn = UnixHTTPConnection(sock_path)
+
+        if params:
+            path += "?" + urlencode(params)
+
+        accept = "application/json"
+        if metadata_only:
+            accept = "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io," + accept
+
+        api_conn.request("GET", path, headers={"Accept": accept})
+        res = api_conn.getresponse()
+        body = res.read()
+        if res.status != 200:
+            return None
+
+        return json.loads(body)
+    except (OSError, http.client.HTTPException, ValueError):
+        api_conn = None
+        return None
+
+# get json-decoded array of items through the kubectl proxy (None when it's not possible)
+def api_items(path, params=None, metadata_only=False):
+    j = api_get(path, params, metadata_only=metadata_only)
+    if j == None:
+        return None
+
+    if "items" in j:
+        return j["items"]
+    else:
+        return [j]
+
+# get named objects one by one from the API path prefix (None when it's not possible)
+def api_named_items(path_prefix, names):
+    items = []
+    for name in names:
+        j = api_get(path_prefix + "/" + urlquote(name, safe=""))
+        if j == None:
+            return None
+        items.append(j)
+
+    return items
+
+
+# known helpers (the name after "k.") which will be created as symbolic links
+# and assigned argument-mediating functions, keyed by the first name segment and the rest
+# (e.g. "po" -> {"": Helper, "co": Helper, "x": Helper})
 symlink_helpers = {}
 
+# split helper name to the first segment and the rest (e.g. "po.co" -> "po", "co")
+def split_helper_name(name):
+    head, _, tail = name.partition(".")
+    return head, tail
+
+# look up the helper definition by the helper name (None if not defined)
+def find_helper(name):
+    head, tail = split_helper_name(name)
+    return symlink_helpers.get(head, {}).get(tail)
+
 # the name of the current helper (if run through a symlink)
 this_helper = os.path.basename(sys.argv[0])
 if this_helper.startswith(HELPER_PREFIX):
@@ -193,9 +560,11 @@ def make_symlinks(args):
     safe_symlink(rel_script_target, symlink_path)
 
     # helper symlinks
-    for h in symlink_helpers:
-        symlink_path = os.path.join(tgt, HELPER_PREFIX + h)
-        safe_symlink(rel_script_target, symlink_path)
+    for head in symlink_helpers:
+        for tail in symlink_helpers[head]:
+            name = head + "." + tail if len(tail) > 0 else head
+            symlink_path = os.path.join(tgt, HELPER_PREFIX + name)
+            safe_symlink(rel_script_target, symlink_path)
 
     print("Created symbolic links at %s" % tgt)
     sys.exit()
@@ -218,22 +587,20 @@ def shared_help(help_func, base_form):
 def apply_ns(args, p=None):
     if p != None and hasattr(p, "namespace"):
         args.append("-n")
-        args.append(p.namespace if len(p.namespace) > 0 else get_ns())
-    else:
-        has_ns = False
-        for a in args:
-            if a == "-n" or a == "--namespace":
-                has_ns = True
-                break
-        if not has_ns:
-            args += ["-n", get_ns()]
+        args.append(p.namespace if p.namespace else get_ns())
+    elif not any(a in ("-n", "--namespace") or a.startswith("--namespace=") for a in args):
+        args += ["-n", get_ns()]
 
     return args
 
 
 def strip_resource_prefix(n):
     nparts = n.split("/")
-    if len(nparts) == 2 and (nparts[0].lower() in KNOWN_K8S_RESOURCES or nparts[0].lower()+"s" in KNOWN_K8S_RESOURCES):
+    if len(nparts) != 2:
+        return n
+
+    res = nparts[0].lower()
+    if res in KNOWN_K8S_RESOURCES or res+"s" in KNOWN_K8S_RESOURCES:
         return os.path.basename(nparts[1])
     else:
         return n
@@ -253,27 +620,53 @@ def default_func_middleware(base_form, pre_cmd=None):
     return f
 
 
+# helper definition; the argument parser is only built when the helper is actually used
+class Helper:
+    def __init__(self, name, description, base_form, pre_cmd, namespaced, func):
+        self.name = name
+        self.description = description
+        self.base_form = base_form
+        self.pre_cmd = pre_cmd
+        self.namespaced = namespaced
+        self.func = func
+        self.arguments = []
+
+    # record an argument to be added to the parser (same signature as ArgumentParser.add_argument)
+    def add_argument(self, *args, **kwargs):
+        self.arguments.append((args, kwargs))
+
+    # build the argument parser
+    def parser(self):
+        p = argparse.ArgumentParser(self.name, description=self.description)
+        p.print_help = shared_help(p.print_help, self.base_form)
+        if self.func != None:
+            p.set_defaults(func=self.func)
+        else:
+            p.set_defaults(func=default_func_middleware(self.base_form, pre_cmd=self.pre_cmd))
+
+        if self.namespaced:
+            p.add_argument("-n", "--namespace",
+                           help="Namespace to work with (the current one by default)")
+
+        for (args, kwargs) in self.arguments:
+            p.add_argument(*args, **kwargs)
+
+        return p
+
+
 def register_helper(name, description, base_form=None, pre_cmd=None, namespaced=True, func=None):
     if base_form == None and func == None:
         fail("base_form or func argument must be defined for register_helper()")
 
-    if name not in symlink_helpers:
-        symlink_helpers[name] = []
+    head, tail = split_helper_name(name)
+    subtree = symlink_helpers.setdefault(head, {})
+    if tail in subtree:
+        fail("helper " + name + " is already registered")
 
-    p = argparse.ArgumentParser(name, description=description)
-    p.print_help = shared_help(p.print_help, base_form)
-    if func != None:
-        p.set_defaults(func=func)
-    else:
-        p.set_defaults(func=default_func_middleware(base_form, pre_cmd=pre_cmd))
+    h = Helper(name, description, base_form, pre_cmd, namespaced, func)
+    subtree[tail] = h
 
-    if namespaced:
-        p.add_argument("-n", "--namespace",
-                       help="Namespace to work with", default=get_ns())
-
-    symlink_helpers[name].append(p)
-
-    return p
+    return h
 
 
 def register_common_helpers(name, k8s_obj_name, long_name=None, namespaced=True):
@@ -337,35 +730,59 @@ def hlp_yaml_middleware(base_form: list):
             print(yaml.dump(y), end='')
     return f
 
+# print node names and the sections of "kubectl describe node" output
+# starting with a start_prefix line up to (excluding) a line starting with end_prefix
+def print_node_sections(out, start_prefix, end_prefix):
+    in_section = False
+
+    for l in out.splitlines():
+        if in_section:
+            if l.startswith(end_prefix):
+                in_section = False
+                print()
+            else:
+                print(l)
+        elif l.startswith("Name:"):
+            print("Name:", l[len("Name:"):].strip())
+        elif l.startswith(start_prefix):
+            in_section = True
+            print(l)
+
+
 def hlp_no_res(p, extra_args):
     out = run_kubectl(["describe", "node"] + extra_args)
-    pattern = re.compile(
-        r'(^Name:\s*(.*?)\n)|(^(Allocated resources:.*?)Events)', flags=re.MULTILINE | re.DOTALL)
-
-    for (_, name, _, res) in re.findall(pattern, out):
-        if len(name) > 0:
-            name = "Name: " + name
-        print(name, res)
+    print_node_sections(out, "Allocated resources:", "Events")
 
 
 def hlp_no_po(p, extra_args):
     out = run_kubectl(["describe", "node"] + extra_args)
-    pattern = re.compile(
-        r'(^Name:\s*(.*?)\n)|(^(Non-terminated Pods:.*?)Allocated)', flags=re.MULTILINE | re.DOTALL)
-
-    for (_, name, _, res) in re.findall(pattern, out):
-        if len(name) > 0:
-            name = "Name: " + name
-        print(name, res)
+    print_node_sections(out, "Non-terminated Pods:", "Allocated")
 
 
 def hlp_use(p, extra_args):
     if p.set_ns != None:
+        # warn only based on already cached names, not to wait for the cluster
+        names = list_namespaces_cached(block=False)
+        if names != None and p.set_ns not in names:
+            print("Warning: namespace \"%s\" not found in context \"%s\"" % (p.set_ns, get_ctx()), file=sys.stderr)
         set_ns(p.set_ns)
     else:
         print("Current namespace:", get_ns(), file=sys.stderr)
 
 
+def hlp_ns_ls(p, extra_args):
+    if p.refresh:
+        names = refresh_ns_cache(get_ctx())
+    else:
+        names = list_namespaces_cached()
+
+    if names == None:
+        fail("Unable to list namespaces")
+
+    for name in names:
+        print(name)
+
+
 def hlp_ctx(p, extra_args):
     if p.set_ctx != None:
         set_ns("default")
@@ -398,8 +815,26 @@ def get_node_external_host(node):
     return exhost
 
 # returns dict of node_name => externalIP keys
-def get_nodes_with_external_host(get_node_args=[]):
-    nodes = kubectl_items(["get", "node", "-o", "json"] + get_node_args)
+def get_nodes_with_external_host(selector=None, names=None):
+    nodes = None
+    if names:
+        if selector == None:
+            nodes = api_named_items("/api/v1/nodes", names)
+    elif selector != None:
+        nodes = api_items("/api/v1/nodes", {"labelSelector": selector})
+    else:
+        nodes = api_items("/api/v1/nodes")
+
+    if nodes == None:
+        get_node_args = []
+        if selector != None:
+            get_node_args += ["-l", selector]
+        if names:
+            get_node_args += names
+        rows = kubectl_rows(["get", "node"] + get_node_args, "Node",
+                            "{{.metadata.name}}\t{{range .status.addresses}}{{.type}}={{.address}} {{end}}")
+        nodes = [{"metadata": {"name": r[0]}, "status": {"addresses": kubectl_pairs_column(r[1], "type", "address")}}
+                 for r in rows if len(r) == 2]
 
     out = {}
 
@@ -410,14 +845,59 @@ def get_nodes_with_external_host(get_node_args=[]):
     return out
 
 
+# run the command on all the nodes with external host via ssh in parallel,
+# yielding (node_name, subprocess.CompletedProcess with captured output) as they finish
+# (nodes without external host come first with None);
+# ssh runs in batch mode so nodes needing a password or passphrase fail instead of prompting at once
+def ssh_nodes(nodes, user, cmd):
+    hosts = {}
+    for node_name in nodes:
+        if nodes[node_name] == None:
+            yield node_name, None
+        else:
+            hosts[node_name] = nodes[node_name]
+
+    if len(hosts) == 0:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(MAX_SSH_PARALLEL, len(hosts))) as executor:
+        futures = {}
+        for node_name in hosts:
+            f = executor.submit(subprocess.run, ["ssh", "-o", "BatchMode=yes"] + SSH_OPTIONS + [user+"@"+hosts[node_name]] + cmd,
+                                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            futures[f] = node_name
+
+        for f in as_completed(futures):
+            yield futures[f], f.result()
+
+
 def hlp_no_x(p, extra_args):
-    node_args = []
-    if p.selector != None:
-        node_args += ["-l", p.selector]
-    if p.nodes != None:
-        node_args += p.nodes
+    nodes = get_nodes_with_external_host(p.selector, p.nodes)
+
+    cmd = []
+    if p.no_sudo != True:
+        cmd = ["sudo"]
 
-    nodes = get_nodes_with_external_host(node_args)
+    interactive = not (p.command != None and len(p.command) > 0 and p.command != "sh")
+    if interactive:
+        cmd += [SHELL_FINDER]
+    else:
+        cmd += [p.command]
+
+    # run non-interactive commands without sudo on multiple nodes at once, printing the whole output of each node
+    # (sudo may need to prompt for a password on the terminal, so it runs node by node with a TTY)
+    if len(nodes) > 1 and not interactive and p.no_sudo:
+        for (node_name, res) in ssh_nodes(nodes, p.user, cmd):
+            print("Name:", node_name, file=sys.stderr)
+            if res == None:
+                print("(no external access)", file=sys.stderr)
+                continue
+
+            sys.stdout.buffer.write(res.stdout)
+            sys.stdout.flush()
+            sys.stderr.buffer.write(res.stderr)
+            sys.stderr.flush()
+        return
 
     for node_name in nodes:
         print("Name:", node_name, file=sys.stderr)
@@ -427,53 +907,36 @@ def hlp_no_x(p, extra_args):
             print("(no external access)", file=sys.stderr)
             continue
 
-        cmd = []
-        if p.no_sudo != True:
-            cmd = ["sudo"]
-
-        if p.command != None and len(p.command) > 0 and p.command != "sh":
-            cmd += [p.command]
-        else:
-            cmd += [SHELL_FINDER]
-
         if len(nodes) > 1:
-            subprocess.run(["ssh", "-t", "-o", "UserKnownHostsFile=/dev/null", "-o", "StrictHostKeyChecking=off", "-o", "LogLevel=error",
-                        p.user+"@"+node_host] + cmd)
+            subprocess.run(["ssh", "-t"] + SSH_OPTIONS + [p.user+"@"+node_host] + cmd)
         else:
-            os.execvpe("ssh", ["ssh", "-t", "-o", "UserKnownHostsFile=/dev/null", "-o", "StrictHostKeyChecking=off", "-o", "LogLevel=error",
-                        p.user+"@"+node_host] + cmd, env=os.environ)
+            os.execvpe("ssh", ["ssh", "-t"] + SSH_OPTIONS + [p.user+"@"+node_host] + cmd, env=os.environ)
 
 
 def hlp_no_df(p, extra_args):
-    node_args = []
-    if p.selector != None:
-        node_args += ["-l", p.selector]
-    if p.nodes != None:
-        node_args += p.nodes
+    nodes = get_nodes_with_external_host(p.selector, p.nodes)
 
-    nodes = get_nodes_with_external_host(node_args)
+    cmd = []
+    if p.no_sudo != True:
+        cmd = ["sudo"]
 
-    for node_name in nodes:
-        print("Name:", node_name)
+    cmd += ["df", "-h"]
 
-        node_host = nodes[node_name]
-        if node_host == None:
+    for (node_name, res) in ssh_nodes(nodes, p.user, cmd):
+        print("Name:", node_name)
+        if res == None:
             print("(no external access)", file=sys.stderr)
             continue
 
-        cmd = []
-        if p.no_sudo != True:
-            cmd = ["sudo"]
-
-        cmd += ["df", "-h"]
-
-        res = subprocess.run(["ssh", "-o", "UserKnownHostsFile=/dev/null", "-o", "StrictHostKeyChecking=off",
-                              p.user+"@"+node_host] + cmd, stderr=subprocess.DEVNULL, stdout=subprocess.PIPE)
-
-        for l in str(res.stdout, encoding="utf-8").splitlines():
+        for l in res.stdout.decode("utf-8").splitlines():
             if l.startswith("/"):
                 print(l)
 
+        if res.returncode != 0:
+            sys.stdout.flush()
+            sys.stderr.buffer.write(res.stderr)
+            sys.stderr.flush()
+
 
 def hlp_no_drain(p, extra_args):
     args = extra_args
@@ -577,34 +1040,58 @@ def hlp_po_x(p, extra_args):
 def hlp_po_co(p, extra_args):
     args = apply_ns([], p)
 
-    items = kubectl_items(["get", "pods", "-o", "json"] + args + extra_args)
+    items = None
+    if not any(a.startswith("-") or "/" in a for a in extra_args):
+        pods_path = "/api/v1/namespaces/" + urlquote(args[1], safe="") + "/pods"
+        if len(extra_args) > 0:
+            items = api_named_items(pods_path, extra_args)
+        else:
+            items = api_items(pods_path)
+    if items == None:
+        rows = kubectl_rows(["get", "pods"] + args + extra_args, "Pod",
+                            "{{.metadata.name}}\t{{range .spec.initContainers}}{{.name}}={{.image}} {{end}}"
+                            "\t{{range .spec.containers}}{{.name}}={{.image}} {{end}}")
+        items = [{"metadata": {"name": r[0]}, "spec": {"initContainers": kubectl_pairs_column(r[1], "name", "image"),
+                                                       "containers": kubectl_pairs_column(r[2], "name", "image")}}
+                 for r in rows if len(r) == 3]
+
     for pod in items:
         print("Name:", pod["metadata"]["name"])
 
         spec = pod["spec"]
-        njust = max_attr_len(spec, ["initContainers", "containers"], "name")
+        init_containers = spec.get("initContainers", ())
+        containers = spec.get("containers", ())
+        njust = max((len(c["name"]) for c in chain(init_containers, containers)), default=0)
 
-        if "initContainers" in spec:
-            for c in spec["initContainers"]:
-                print(" I", c["name"].ljust(njust), " ", "image:", c["image"])
+        for c in init_containers:
+            print(" I", c["name"].ljust(njust), " ", "image:", c["image"])
 
-        if "containers" in spec:
-            for c in spec["containers"]:
-                print(" C", c["name"].ljust(njust), " ", "image:", c["image"])
+        for c in containers:
+            print(" C", c["name"].ljust(njust), " ", "image:", c["image"])
 
         print()
 
 
+# scalable object kinds with their namespaced API paths
+SCALABLE_KIND_PATHS = [("deployment", "/apis/apps/v1/namespaces/%s/deployments"),
+                       ("replicaset", "/apis/apps/v1/namespaces/%s/replicasets"),
+                       ("replicationcontroller", "/api/v1/namespaces/%s/replicationcontrollers"),
+                       ("statefulset", "/apis/apps/v1/namespaces/%s/statefulsets")]
+
+
 def hlp_scale(p, extra_args):
     args = apply_ns([], p)
 
-    targets_contain_objtypes = True
     targets = []
+    untyped_names = set()  # lowercase names of targets without the kind prefix
 
     # extracts name from "name=replicas" definition
     def name_from_def(defstr):
         return defstr.split("=", 1)[0]
 
+    # only the namespace in args so far
+    ns_args = list(args)
+
     # split extra_args to args and target object names
     for a in extra_args:
         if a.startswith("-"):
@@ -613,16 +1100,34 @@ def hlp_scale(p, extra_args):
             targets.append(a)
 
             if "/" not in a:
-                targets_contain_objtypes = False
+                untyped_names.add(name_from_def(a).lower())
 
-    if not targets_contain_objtypes:
+    # all targets have the kind prefix, no need to look them up
+    if len(untyped_names) > 0:
         # get names of all possible objects
         known_kinds = {}  # oair of: lowercase item_name -> array of lowercase kinds
-        items = kubectl_items(
-            ["get", "deployment,replicaset,replicationcontroller,statefulset", "-o", "json"] + args)
-        for i in items:
-            kind = i["kind"].lower()
-            name = i["metadata"]["name"].lower()
+        kind_names = None  # list of (lowercase kind, lowercase name) pairs
+
+        # list just metadata through the proxy if no other arguments are given
+        if args == ns_args:
+            kind_names = []
+            ns = urlquote(args[1], safe="")
+            for (kind, path) in SCALABLE_KIND_PATHS:
+                items = api_items(path % ns, metadata_only=True)
+                if items == None:
+                    kind_names = None
+                    break
+                kind_names += [(kind, i["metadata"]["name"].lower()) for i in items]
+
+        # otherwise only the kind and name columns
+        if kind_names == None:
+            out = run_kubectl(["get", "deployment,replicaset,replicationcontroller,statefulset",
+                               "-o", "custom-columns=KIND:.kind,NAME:.metadata.name", "--no-headers"] + args)
+            kind_names = [tuple(l.lower().split()) for l in out.splitlines() if len(l.split()) == 2]
+
+        for (kind, name) in kind_names:
+            if name not in untyped_names:
+                continue
 
             if name not in known_kinds:
                 known_kinds[name] = []
@@ -663,6 +1168,10 @@ h.add_argument("--no-it", default=False, action="store_true",
                help="do not add -i -t arguments")
 
 register_common_helpers("ns", "namespace", "namespaces")
+h = register_helper("ns.ls", "list namespace names (cached, suitable for shell completion)",
+                    namespaced=False, func=hlp_ns_ls)
+h.add_argument("-r", "--refresh", default=False, action="store_true",
+               help="refresh the cached namespace list now")
 register_common_helpers("po", "pod", "pods")
 h = register_helper("po.names", "get the names of the matching pods", [
                     "get", "pods", "-o", "jsonpath='{.items[*].metadata.name}'"])
@@ -719,7 +1228,8 @@ h.add_argument("nodes", nargs="*", help="node names")
 h.add_argument("-l", "--selector", help="node label selector")
 h.add_argument(
     "-u", "--user", help="user to connect via ssh to", default=DEFAULT_USER)
-h.add_argument("-S", "--no-sudo", help="do not use sudo before command", action="store_true")
+h.add_argument("-S", "--no-sudo", help="do not use sudo before command (runs a command on multiple nodes in parallel)",
+               action="store_true")
 h.add_argument("-x", "--command", "--execute",
                help="remote command to execute", default="sh")
 
@@ -777,46 +1287,51 @@ cmd_install.set_defaults(func=make_symlinks)
 cmd_install.add_argument("-t", "--target-path",
                          help="target path to install symlinks")
 
+cmd_stop_proxy = subparser.add_parser(
+    "stop-proxy", description="stop the background kubectl proxy")
+cmd_stop_proxy.set_defaults(func=lambda args: stop_proxy())
+
 # common actions
 if os.path.basename(sys.argv[0]) == "k":
     args = apply_ns(sys.argv[1:])
     exec_kubectl(args)
     sys.exit(0)
 elif len(sys.argv) > 1:
-    if sys.argv[1] == "install-symlinks":
+    if sys.argv[1] == "install-symlinks" or sys.argv[1] == "stop-proxy":
         args = parser.parse_args()
         if hasattr(args, "func") and args.func != None:
             args.func(args)
         sys.exit(0)
     if sys.argv[1] == "-h" or sys.argv[1] == "--help":
-        cmd_install.print_help()
-        for h in symlink_helpers:
-            for p in symlink_helpers[h]:
-                print(p.description, end="\n ")
-                p.print_usage()
+        # help for a subtree only (e.g. "-h po" for all po.* helpers)
+        if len(sys.argv) > 2:
+            head = split_helper_name(sys.argv[2])[0]
+            if head not in symlink_helpers:
+                fail("No helpers " + HELPER_PREFIX + head + ".*")
+            heads = [head]
+        else:
+            cmd_install.print_help()
+            print()
+            cmd_stop_proxy.print_help()
+            heads = symlink_helpers
+
+        for head in heads:
+            for hlp in symlink_helpers[head].values():
+                print(hlp.description, end="\n ")
+                hlp.parser().print_usage()
         print()
+
+        if len(sys.argv) > 2:
+            sys.exit(0)
         exec_kubectl(["--help"])
         sys.exit(0)
 
 # attempt to run the helper command
-if this_helper in symlink_helpers:
-    matched = False
-
-    for p in symlink_helpers[this_helper]:
-        try:
-            args, extra_args = p.parse_known_args(sys.argv[1:])
-            args.func(args, extra_args)
-            matched = True
-            break
-        except SystemExit:
-            pass
-
-    if matched != True:
-        # for p in symlink_helpers[this_helper]:
-        #    p.print_usage()
-        sys.exit(45)
-    else:
-        sys.exit()  # should not go here normally (helper function has been called)
+hlp = find_helper(this_helper)
+if hlp != None:
+    args, extra_args = hlp.parser().parse_known_args(sys.argv[1:])
+    args.func(args, extra_args)
+    sys.exit()  # should not go here normally (helper function has been called)
 
 # run the kubectl command unmodified (we don't have a helper defined!)
 argv = sys.argv[1:]
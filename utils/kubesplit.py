@@ -8,6 +8,17 @@ import argparse
 import re
 import yaml
 
+# use the libyaml-based C implementation when available
+try:
+  from yaml import CSafeLoader as SafeLoader
+except ImportError:
+  from yaml import SafeLoader
+
+# YAML document separator line
+DOCUMENT_SEPARATOR = re.compile(r'---(?=[ \t\r\n]|$)[ \t]*')
+# YAML document end marker line
+DOCUMENT_END = re.compile(r'\.\.\.\s*$')
+
 parser = argparse.ArgumentParser(description='Kubernetes YAML filter')
 parser.add_argument('input',help='Input manifest')
 parser.add_argument('--only-kinds', '-k', nargs='+', default=[], help='only keep objects of the specified Kind(s)')
@@ -16,11 +27,18 @@ parser.add_argument('--only-names', nargs='+', default=[], help='keep objects wh
 
 args = parser.parse_args()
 
-# lowercase args
-for n, v in enumerate(args.only_kinds):
-  args.only_kinds[n] = v.lower()
-for n, v in enumerate(args.skip_kinds):
-  args.skip_kinds[n] = v.lower()
+# lowercase kind sets
+args.only_kinds = frozenset(v.lower() for v in args.only_kinds)
+args.skip_kinds = frozenset(v.lower() for v in args.skip_kinds)
+
+# compile name regexps once
+only_names_compiled = [re.compile(p) for p in args.only_names]
+
+# join them into a single regexp when that can't change their meaning
+# (no inline global flags and no groups which backreferences could refer to)
+default_flags = re.compile('').flags
+if len(only_names_compiled) > 1 and all(r.flags == default_flags and r.groups == 0 for r in only_names_compiled):
+  only_names_compiled = [re.compile('|'.join('(?:%s)' % p for p in args.only_names))]
 
 # known objects
 knownObjects = set()
@@ -35,11 +53,37 @@ def objectIdentifier(yml_dict):
   
   return h
 
+# read the manifest line by line, yielding the original text of its documents
+def rawDocuments(f):
+  lines = []
+  for line in f:
+    sep = DOCUMENT_SEPARATOR.match(line)
+    if sep:
+      yield ''.join(lines)
+      lines = []
+      line = line[sep.end():]
+      if line.strip() == '':
+        continue
+    elif DOCUMENT_END.match(line):
+      # the end marker stays with the document it ends (unless there is no content to end)
+      if not line.endswith('\n'):
+        line += '\n'
+      if any(l.strip() != '' and not l.lstrip().startswith('#') for l in lines):
+        lines.append(line)
+      yield ''.join(lines)
+      lines = []
+      continue
+    if lines or line.strip() != '':
+      lines.append(line)
 
-with open(args.input) as f:
-  yml_document_all = yaml.safe_load_all(f)
-  
-  for yml_document in yml_document_all:
+  if lines and not lines[-1].endswith('\n'):
+    lines.append('\n')
+  yield ''.join(lines)
+
+with open(args.input, 'r', buffering=1<<20) as f:
+  # parse documents one at a time just to decide which to keep, writing out their original text
+  for raw_document in rawDocuments(f):
+    yml_document = yaml.load(raw_document, Loader=SafeLoader)
     if yml_document is None:
       continue
 
@@ -52,14 +96,9 @@ with open(args.input) as f:
     metadata = yml_document.get('metadata', None)
 
     # if only_names regexps are defined
-    if metadata and len(args.only_names) > 0:
-      match = False
-      for pattern in args.only_names:
-        if re.search(pattern, metadata.get('name', '')):
-          match = True
-          break
-      
-      if not match:
+    if metadata and len(only_names_compiled) > 0:
+      name = metadata.get('name', '')
+      if not any(r.search(name) for r in only_names_compiled):
         continue # skip if no regexp matches part of this name
 
     oi = objectIdentifier(yml_document)
@@ -70,4 +109,4 @@ with open(args.input) as f:
     knownObjects.add(oi)
     #print(oi, file=sys.stderr)
 
-    print(yaml.dump(yml_document), end="---"+os.linesep)
+    print(raw_document, end="---"+os.linesep)